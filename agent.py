@@ -1,5 +1,6 @@
 import os
 import json
+import orjson
 import logging
 import certifi
 import pytz
@@ -31,15 +32,15 @@ logging.getLogger("hpack").setLevel(logging.WARNING)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-load_dotenv()
 logger = logging.getLogger("outbound-agent")
-logging.basicConfig(level=logging.INFO)
+logger.setLevel(logging.INFO)  # handlers come from the LiveKit CLI / the importing process
 
 from livekit import api
 from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     RoomInputOptions,
     WorkerOptions,
     cli,
@@ -152,6 +153,7 @@ def get_language_instruction(lang_preset: str) -> str:
 
 
 # ── External imports ──────────────────────────────────────────────────────────
+import db
 from calendar_tools import get_available_slots, create_booking, cancel_booking
 from notify import (
     notify_booking_confirmed,
@@ -323,11 +325,82 @@ class OutboundAssistant(Agent):
         )
 
 
+# ══════════════════════════════════════════════════════════════════════════════
+# TTS + WORKER PREWARM
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _apply_config_env(live_config: dict):
+    for key in ["LIVEKIT_URL","LIVEKIT_API_KEY","LIVEKIT_API_SECRET","OPENAI_API_KEY",
+                "SARVAM_API_KEY","CAL_API_KEY","TELEGRAM_BOT_TOKEN","SUPABASE_URL","SUPABASE_KEY"]:
+        val = live_config.get(key.lower(), "")
+        if val:
+            os.environ[key] = val
+
+
+def _tts_key(live_config: dict) -> tuple:
+    """Everything _build_tts depends on — a prewarmed TTS is reused only on an exact match."""
+    return (
+        live_config.get("tts_provider", "sarvam"),
+        live_config.get("tts_voice", "kavya"),
+        live_config.get("tts_language", "hi-IN"),
+        live_config.get("elevenlabs_voice_id", "21m00Tcm4TlvDq8ikWAM"),
+        os.environ.get("SARVAM_API_KEY", ""),
+        os.environ.get("ELEVEN_API_KEY", ""),
+    )
+
+
+def _build_tts(live_config: dict):
+    tts_voice    = live_config.get("tts_voice", "kavya")
+    tts_language = live_config.get("tts_language", "hi-IN")
+    tts_provider = live_config.get("tts_provider", "sarvam")
+
+    if tts_provider == "elevenlabs":
+        try:
+            from livekit.plugins import elevenlabs
+            _el_voice_id = live_config.get("elevenlabs_voice_id", "21m00Tcm4TlvDq8ikWAM")
+            agent_tts = elevenlabs.TTS(
+                model="eleven_turbo_v2_5",
+                voice_id=_el_voice_id,
+            )
+            logger.info(f"[TTS] Using ElevenLabs Turbo v2.5 — voice: {_el_voice_id}")
+            return agent_tts
+        except ImportError:
+            logger.warning("[TTS] elevenlabs plugin not installed — falling back to Sarvam")
+            return sarvam.TTS(
+                target_language_code=tts_language,
+                model="bulbul:v3",
+                speaker=tts_voice,
+                speech_sample_rate=24000,
+            )
+
+    agent_tts = sarvam.TTS(
+        target_language_code=tts_language,
+        model="bulbul:v3",
+        speaker=tts_voice,
+        speech_sample_rate=24000,          # force 24kHz (#2)
+    )
+    logger.info(f"[TTS] Using Sarvam Bulbul v3 — voice: {tts_voice} lang: {tts_language}")
+    return agent_tts
+
+
+def prewarm(proc: JobProcess):
+    """Runs once per worker process, before any job is assigned to it."""
+    live_config = get_live_config()
+    _apply_config_env(live_config)
+    try:
+        proc.userdata["tts"]     = _build_tts(live_config)
+        proc.userdata["tts_key"] = _tts_key(live_config)
+    except Exception as e:
+        logger.warning(f"[PREWARM] TTS build failed — will build per call: {e}")
+    count_tokens("")  # loads the tiktoken encoding
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # MAIN ENTRYPOINT
 # ══════════════════════════════════════════════════════════════════════════════
 
 agent_is_speaking = False
+EGRESS_START_TIMEOUT = 10  # seconds
 
 async def entrypoint(ctx: JobContext):
     global agent_is_speaking
@@ -345,7 +418,7 @@ async def entrypoint(ctx: JobContext):
     metadata = ctx.job.metadata or ""
     if metadata:
         try:
-            meta = json.loads(metadata)
+            meta = orjson.loads(metadata)
             phone_number = meta.get("phone_number")
         except Exception:
             pass
@@ -378,35 +451,20 @@ async def entrypoint(ctx: JobContext):
     llm_model     = live_config.get("llm_model", "gpt-4o-mini")
     llm_provider  = live_config.get("llm_provider", "openai")
     tts_voice     = live_config.get("tts_voice", "kavya")
-    tts_language  = live_config.get("tts_language", "hi-IN")
-    tts_provider  = live_config.get("tts_provider", "sarvam")
     stt_provider  = live_config.get("stt_provider", "sarvam")
     stt_language  = live_config.get("stt_language", "unknown")  # auto-detect (#20)
     max_turns     = live_config.get("max_turns", 25)
 
     # Override OS env vars from UI config
-    for key in ["LIVEKIT_URL","LIVEKIT_API_KEY","LIVEKIT_API_SECRET","OPENAI_API_KEY",
-                "SARVAM_API_KEY","CAL_API_KEY","TELEGRAM_BOT_TOKEN","SUPABASE_URL","SUPABASE_KEY"]:
-        val = live_config.get(key.lower(), "")
-        if val:
-            os.environ[key] = val
+    _apply_config_env(live_config)
 
     # ── Caller memory (#15) ───────────────────────────────────────────────
     async def get_caller_history(phone: str) -> str:
         if phone == "unknown":
             return ""
         try:
-            sb = db.get_supabase()
-            if not sb:
-                return ""
-            result = (sb.table("call_logs")
-                        .select("summary, created_at")
-                        .eq("phone_number", phone)
-                        .order("created_at", desc=True)
-                        .limit(1)
-                        .execute())
-            if result.data:
-                last = result.data[0]
+            last = await db.fetch_last_call(phone)
+            if last:
                 return f"\n\n[CALLER HISTORY: Last call {last['created_at'][:10]}. Summary: {last['summary']}]"
         except Exception as e:
             logger.warning(f"[MEMORY] Could not load history: {e}")
@@ -476,32 +534,12 @@ async def entrypoint(ctx: JobContext):
         )
         logger.info("[STT] Using Sarvam Saaras v3")
 
-    # ── Build TTS (#2 24kHz, #10 ElevenLabs) ────────────────────────────
-    if tts_provider == "elevenlabs":
-        try:
-            from livekit.plugins import elevenlabs
-            _el_voice_id = live_config.get("elevenlabs_voice_id", "21m00Tcm4TlvDq8ikWAM")
-            agent_tts = elevenlabs.TTS(
-                model="eleven_turbo_v2_5",
-                voice_id=_el_voice_id,
-            )
-            logger.info(f"[TTS] Using ElevenLabs Turbo v2.5 — voice: {_el_voice_id}")
-        except ImportError:
-            logger.warning("[TTS] elevenlabs plugin not installed — falling back to Sarvam")
-            agent_tts = sarvam.TTS(
-                target_language_code=tts_language,
-                model="bulbul:v3",
-                speaker=tts_voice,
-                speech_sample_rate=24000,
-            )
+    # ── Build TTS (#2 24kHz, #10 ElevenLabs) — reuse the prewarmed one if it matches
+    if ctx.proc.userdata.get("tts_key") == _tts_key(live_config):
+        agent_tts = ctx.proc.userdata["tts"]
+        logger.info("[TTS] Using prewarmed TTS")
     else:
-        agent_tts = sarvam.TTS(
-            target_language_code=tts_language,
-            model="bulbul:v3",
-            speaker=tts_voice,
-            speech_sample_rate=24000,          # force 24kHz (#2)
-        )
-        logger.info(f"[TTS] Using Sarvam Bulbul v3 — voice: {tts_voice} lang: {tts_language}")
+        agent_tts = _build_tts(live_config)
 
     # ── Sentence chunker (keep responses short for voice) ─────────────────
     def before_tts_cb(agent_response: str) -> str:
@@ -558,48 +596,56 @@ async def entrypoint(ctx: JobContext):
 
     # ── Recording → Supabase Storage ─────────────────────────────────────
     egress_id = None
+    rec_api = None
     try:
         rec_api = api.LiveKitAPI(
             url=os.environ["LIVEKIT_URL"],
             api_key=os.environ["LIVEKIT_API_KEY"],
             api_secret=os.environ["LIVEKIT_API_SECRET"],
         )
-        egress_resp = await rec_api.egress.start_room_composite_egress(
-            api.RoomCompositeEgressRequest(
-                room_name=ctx.room.name,
-                audio_only=True,
-                file_outputs=[api.EncodedFileOutput(
-                    file_type=api.EncodedFileType.OGG,
-                    filepath=f"recordings/{ctx.room.name}.ogg",
-                    s3=api.S3Upload(
-                        access_key=os.environ["SUPABASE_S3_ACCESS_KEY"],
-                        secret=os.environ["SUPABASE_S3_SECRET_KEY"],
-                        bucket="call-recordings",
-                        region=os.environ.get("SUPABASE_S3_REGION", "ap-south-1"),
-                        endpoint=os.environ["SUPABASE_S3_ENDPOINT"],
-                        force_path_style=True,
-                    )
-                )]
-            )
+        # Bounded: a hung egress request would otherwise stall the rest of
+        # entrypoint (including the hangup/shutdown handler registration below).
+        egress_resp = await asyncio.wait_for(
+            rec_api.egress.start_room_composite_egress(
+                api.RoomCompositeEgressRequest(
+                    room_name=ctx.room.name,
+                    audio_only=True,
+                    file_outputs=[api.EncodedFileOutput(
+                        file_type=api.EncodedFileType.OGG,
+                        filepath=f"recordings/{ctx.room.name}.ogg",
+                        s3=api.S3Upload(
+                            access_key=os.environ["SUPABASE_S3_ACCESS_KEY"],
+                            secret=os.environ["SUPABASE_S3_SECRET_KEY"],
+                            bucket="call-recordings",
+                            region=os.environ.get("SUPABASE_S3_REGION", "ap-south-1"),
+                            endpoint=os.environ["SUPABASE_S3_ENDPOINT"],
+                            force_path_style=True,
+                        )
+                    )]
+                )
+            ),
+            timeout=EGRESS_START_TIMEOUT,
         )
         egress_id = egress_resp.egress_id
-        await rec_api.aclose()
         logger.info(f"[RECORDING] Started egress: {egress_id}")
+    except asyncio.TimeoutError:
+        logger.warning(f"[RECORDING] Egress start timed out after {EGRESS_START_TIMEOUT}s — continuing without recording")
     except Exception as e:
         logger.warning(f"[RECORDING] Failed to start recording: {e}")
+    finally:
+        if rec_api:
+            await rec_api.aclose()
 
     # ── Upsert active_calls (#38) ─────────────────────────────────────────
     async def upsert_active_call(status: str):
         try:
-            sb = db.get_supabase()
-            if sb:
-                sb.table("active_calls").upsert({
-                    "room_id":     ctx.room.name,
-                    "phone":       caller_phone,
-                    "caller_name": caller_name,
-                    "status":      status,
-                    "last_updated": datetime.utcnow().isoformat(),
-                }).execute()
+            await db.upsert_active_call({
+                "room_id":     ctx.room.name,
+                "phone":       caller_phone,
+                "caller_name": caller_name,
+                "status":      status,
+                "last_updated": datetime.utcnow().isoformat(),
+            })
         except Exception as e:
             logger.debug(f"[ACTIVE-CALL] {e}")
 
@@ -608,14 +654,12 @@ async def entrypoint(ctx: JobContext):
     # ── Real-time transcript streaming (#33) ─────────────────────────────
     async def _log_transcript(role: str, content: str):
         try:
-            sb = db.get_supabase()
-            if sb:
-                sb.table("call_transcripts").insert({
-                    "call_room_id": ctx.room.name,
-                    "phone":        caller_phone,
-                    "role":         role,
-                    "content":      content,
-                }).execute()
+            await db.log_transcript({
+                "call_room_id": ctx.room.name,
+                "phone":        caller_phone,
+                "role":         role,
+                "content":      content,
+            })
         except Exception as e:
             logger.debug(f"[TRANSCRIPT-STREAM] {e}")
 
@@ -692,6 +736,7 @@ async def entrypoint(ctx: JobContext):
 
         # Booking
         booking_status_msg = "No booking"
+        was_booked = False
         if agent_tools.booking_intent:
             from calendar_tools import async_create_booking
             intent = agent_tools.booking_intent
@@ -712,6 +757,7 @@ async def entrypoint(ctx: JobContext):
                     ai_summary="",
                 )
                 booking_status_msg = f"Booking Confirmed: {result.get('booking_id')}"
+                was_booked = True
             else:
                 booking_status_msg = f"Booking Failed: {result.get('message')}"
         else:
@@ -819,8 +865,8 @@ async def entrypoint(ctx: JobContext):
                 logger.warning(f"[N8N] Webhook failed: {e}")
 
         # Save to Supabase
-        from db import save_call_log
-        save_call_log(
+        from db import save_call_log, flush_call_logs
+        await save_call_log(
             phone=caller_phone,
             duration=duration,
             transcript=transcript_text,
@@ -832,9 +878,10 @@ async def entrypoint(ctx: JobContext):
             call_date=call_dt.date().isoformat(),
             call_hour=call_dt.hour,
             call_day_of_week=call_dt.strftime("%A"),
-            was_booked=bool(agent_tools.booking_intent),
+            was_booked=was_booked,
             interrupt_count=interrupt_count,
         )
+        await flush_call_logs()  # job process may exit right after this hook
 
     ctx.add_shutdown_callback(unified_shutdown_hook)
 
@@ -844,7 +891,9 @@ async def entrypoint(ctx: JobContext):
 # ══════════════════════════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
+    load_dotenv()  # job processes inherit the environment from here
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
         agent_name="outbound-caller",
     ))
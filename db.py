@@ -1,35 +1,201 @@
 import os
 import time
+import base64
+import tempfile
+import asyncio
+import functools
 import logging
-from supabase import create_client, Client
+from datetime import datetime
+import httpx
+import numpy as np
+import orjson
+import msgspec
+from tenacity import (
+    AsyncRetrying, RetryCallState, retry_if_exception,
+    stop_after_attempt, wait_random_exponential,
+)
+from supabase import create_client, Client, ClientOptions
 
 logger = logging.getLogger("db")
 
-# ─── Columns added by supabase_migration_v2.sql ───────────────────────────────
-# If the migration hasn't been run yet, these columns won't exist.
-# We detect PGRST204 (schema cache miss) and retry with just base columns.
-_ANALYTICS_COLUMNS = {
-    "sentiment", "was_booked", "interrupt_count",
-    "estimated_cost_usd", "call_date", "call_hour", "call_day_of_week",
-}
-_BASE_COLUMNS = {"phone_number", "duration_seconds", "transcript", "summary",
-                 "recording_url", "caller_name"}
+# ─── call_logs row ────────────────────────────────────────────────────────────
+class CallLog(msgspec.Struct, omit_defaults=True):
+    """One call_logs row. Optional fields left at their default are omitted from the JSON."""
+    phone_number:       str
+    duration_seconds:   int
+    transcript:         str
+    summary:            str
+    sentiment:          str
+    was_booked:         bool
+    interrupt_count:    int
+    recording_url:      str | None = None
+    caller_name:        str | None = None
+    estimated_cost_usd: float | None = None
+    call_date:          str | None = None
+    call_hour:          int | None = None
+    call_day_of_week:   str | None = None
+
+
+_json_encoder = msgspec.json.Encoder()
+
+_CALL_LOG_COLUMNS = ",".join(CallLog.__struct_fields__)
+
+# Columns that exist before supabase_migration_v2.sql. If the analytics
+# columns are missing we get PGRST204 and retry with just these.
+_BASE_COLUMNS = "phone_number,duration_seconds,transcript,summary,recording_url,caller_name"
 
 # ─── Retry helper ─────────────────────────────────────────────────────────────
 _MAX_RETRIES = 3
-_RETRY_DELAYS = [1.0, 2.0, 4.0]   # seconds — covers transient SSL 525 errors
+_RETRY_MAX_DELAY = 4.0   # seconds — full-jitter backoff, covers transient SSL 525 errors
+_RETRYABLE_STATUS = frozenset({502, 503, 504, 525})
 
 
-def _is_retryable(err_str: str) -> bool:
+def _is_retryable(exc: BaseException) -> bool:
     """True if the error is a transient network or SSL failure worth retrying."""
-    transient = ("525", "ssl", "timeout", "connection", "network", "502", "503", "504")
-    el = err_str.lower()
-    return any(k in el for k in transient)
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in _RETRYABLE_STATUS
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    err = str(retry_state.outcome.exception())
+    logger.warning(
+        f"Transient error (attempt {retry_state.attempt_number}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s: {err[:80]}"
+    )
+
+
+def _retrying() -> AsyncRetrying:
+    # Full jitter so concurrent writers don't retry in lockstep.
+    return AsyncRetrying(
+        stop=stop_after_attempt(_MAX_RETRIES),
+        wait=wait_random_exponential(multiplier=1, max=_RETRY_MAX_DELAY),
+        retry=retry_if_exception(_is_retryable),
+        before_sleep=_log_retry,
+        reraise=True,
+    )
+
+
+# ─── Circuit breaker (inserts) ────────────────────────────────────────────────
+# After _BREAKER_THRESHOLD consecutive transient insert failures, stop talking to
+# Supabase for _BREAKER_COOLDOWN seconds instead of piling retries onto an outage.
+# LiveKit runs one job per process and each sends a single batch, so the state
+# lives in a small file shared by every process on the host, not in globals.
+# The same file remembers projects without insert_call_logs() (see _insert_batch).
+_BREAKER_THRESHOLD = 5
+_BREAKER_COOLDOWN = 30.0   # seconds
+_BREAKER_FILE = os.path.join(tempfile.gettempdir(), "inboundai_supabase_breaker.json")
+
+
+def _breaker_state() -> dict:
+    try:
+        with open(_BREAKER_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return {"failures": 0, "open_until": 0.0}
+
+
+def _write_breaker_state(state: dict) -> None:
+    # Write-then-rename so a concurrent reader never sees a partial file.
+    tmp = f"{_BREAKER_FILE}.{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(tmp, _BREAKER_FILE)
+    except OSError as e:
+        logger.debug(f"Could not persist breaker state: {e}")
+
 
+def _circuit_open() -> bool:
+    return time.time() < _breaker_state()["open_until"]
 
-def _is_schema_error(err_str: str) -> bool:
-    """True if Supabase returned PGRST204 — column not found in schema cache."""
-    return "PGRST204" in err_str or "schema cache" in err_str.lower()
+
+def _record_failure() -> None:
+    state = _breaker_state()
+    state["failures"] += 1
+    if state["failures"] >= _BREAKER_THRESHOLD:
+        state["open_until"] = time.time() + _BREAKER_COOLDOWN
+        logger.warning(f"Supabase circuit open for {_BREAKER_COOLDOWN:.0f}s after {state['failures']} failures")
+    _write_breaker_state(state)
+
+
+def _record_success() -> None:
+    state = _breaker_state()
+    if state["failures"] or state["open_until"]:
+        state["failures"], state["open_until"] = 0, 0.0
+        _write_breaker_state(state)
+
+
+# A PGRST202 from insert_call_logs() is remembered per project URL for
+# _RPC_MISSING_TTL seconds, so later jobs skip the doomed RPC until it's
+# worth checking whether supabase_migration_v3.sql has been run.
+_RPC_MISSING_TTL = 600.0   # seconds
+
+
+def _insert_rpc_missing(url: str) -> bool:
+    return time.time() < _breaker_state().get("insert_rpc_missing", {}).get(url, 0.0)
+
+
+def _mark_insert_rpc_missing(url: str) -> None:
+    state = _breaker_state()
+    state.setdefault("insert_rpc_missing", {})[url] = time.time() + _RPC_MISSING_TTL
+    _write_breaker_state(state)
+
+
+# ─── Read cache (dashboard polling) ───────────────────────────────────────────
+# fetch_bookings / fetch_stats results are reused for _CACHE_TTL seconds, keyed
+# on the Supabase credentials so a project switch in the UI takes effect at once.
+# Call logs are written by the agent processes, not the dashboard, so staleness
+# is bounded by the TTL; the clear on write only helps same-process writers.
+_CACHE_TTL = 10.0   # seconds
+_cache: dict = {}
+_cache_generation = 0
+
+
+def _invalidate_cache() -> None:
+    global _cache_generation
+    _cache_generation += 1
+    _cache.clear()
+
+
+def _cached(ttl: float, fallback):
+    """
+    Cache fn's result for ttl seconds. fn raises on failure; the wrapper logs,
+    returns fallback() and caches nothing, so one transient error isn't served
+    for the whole TTL.
+    """
+    def decorator(fn):
+        what = fn.__name__.replace("_", " ")
+
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            creds = (os.environ.get("SUPABASE_URL", ""), os.environ.get("SUPABASE_KEY", ""))
+            key = (fn.__name__, creds, args)
+            now = time.monotonic()
+            hit = _cache.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+            generation = _cache_generation
+            try:
+                value = await fn(*args)
+            except Exception as e:
+                logger.error(f"Failed to {what}: {e}")
+                return fallback()
+            if generation == _cache_generation:   # no write landed mid-fetch
+                _cache[key] = (now + ttl, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def _is_missing_function(resp) -> bool:
+    """True if an /rpc call hit PGRST202 — function not created yet (migration_v3 not run)."""
+    return resp.status_code == 404 and "PGRST202" in resp.text
+
+
+def _is_schema_error(resp) -> bool:
+    """True if Supabase returned PGRST204 — column not found in schema cache (migration_v2 not run)."""
+    return resp.status_code == 400 and "PGRST204" in resp.text
 
 
 # ─── Client ───────────────────────────────────────────────────────────────────
@@ -40,15 +206,170 @@ def get_supabase() -> Client | None:
     if not url or not key:
         return None
     try:
-        return create_client(url, key)
+        return _create_supabase(url, key)
     except Exception as e:
         logger.error(f"Failed to init Supabase client: {e}")
         return None
 
 
+# Pool limits for both the sync (supabase-py) and async (PostgREST) clients.
+# Both speak HTTP/2, so concurrent requests multiplex over one TLS connection.
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+# An injected httpx.Client replaces supabase-py's own timeouts; keep its
+# postgrest_client_timeout default (120 s) instead of httpx's 5 s.
+_SYNC_TIMEOUT = 120
+
+# One supabase-py client (and connection pool) for the current credential pair.
+_supabase: Client | None = None
+_supabase_http: httpx.Client | None = None
+_supabase_creds: tuple[str, str] = ("", "")
+
+
+def _create_supabase(url: str, key: str) -> Client:
+    global _supabase, _supabase_http, _supabase_creds
+    if _supabase is None or _supabase_creds != (url, key):
+        # Build first: a failure raises and leaves the previous client in place.
+        http = httpx.Client(http2=True, limits=_HTTP_LIMITS, timeout=_SYNC_TIMEOUT)
+        try:
+            client = create_client(url, key, options=ClientOptions(httpx_client=http))
+        except Exception:
+            http.close()
+            raise
+        if _supabase_http is not None:
+            _supabase_http.close()
+        _supabase, _supabase_http, _supabase_creds = client, http, (url, key)
+    return _supabase
+
+
+# Shared async PostgREST client. supabase-py's query builder is synchronous and
+# would block the agent's event loop, so agent and call_logs traffic goes to the
+# REST API. Rebuilt only when SUPABASE_URL / SUPABASE_KEY change (UI config).
+_client: httpx.AsyncClient | None = None
+_client_creds: tuple[str, str] = ("", "")
+_logged_unconfigured = False
+
+
+def _get_client() -> httpx.AsyncClient | None:
+    global _client, _client_creds, _logged_unconfigured
+    url = os.environ.get("SUPABASE_URL", "")
+    key = os.environ.get("SUPABASE_KEY", "")
+    if not url or not key:
+        if not _logged_unconfigured:
+            logger.info("Supabase not configured (SUPABASE_URL / SUPABASE_KEY unset) — call logs stay local.")
+            _logged_unconfigured = True
+        return None
+    if _client is None or _client_creds != (url, key):
+        if _client is not None:
+            asyncio.get_running_loop().create_task(_client.aclose())
+        _client = httpx.AsyncClient(
+            base_url=url.rstrip("/") + "/rest/v1",
+            headers={
+                "apikey":        key,
+                "Authorization": f"Bearer {key}",
+                "Prefer":        "return=representation",
+            },
+            http2=True,
+            limits=_HTTP_LIMITS,
+            timeout=10,
+        )
+        _client_creds = (url, key)
+    return _client
+
+
+def _raise_for_status(resp: httpx.Response) -> None:
+    """Like resp.raise_for_status(), but keeps the PostgREST error body (PGRST codes) in the message."""
+    if resp.is_error:
+        raise httpx.HTTPStatusError(
+            f"{resp.status_code}: {resp.text}", request=resp.request, response=resp
+        )
+
+
+async def _select(client: httpx.AsyncClient, params: dict) -> list:
+    resp = await client.get("/call_logs", params=params)
+    _raise_for_status(resp)
+    return orjson.loads(resp.content)
+
+
+# was_booked is only trustworthy once supabase_migration_v3.sql has realigned
+# it with the summary (older agents set it from the booking *intent*). v3 also
+# creates call_stats(), so its presence gates the switch; until then a booking
+# is recognised by the "Booking Confirmed" summary the agent writes.
+_BOOKED_BY_SUMMARY = {"summary": "ilike.*Confirmed*"}
+_has_v3: set = set()   # credential pairs whose project has call_stats()
+_logged_no_v3 = False
+
+
+async def _booked_filter(client: httpx.AsyncClient) -> dict:
+    global _logged_no_v3
+    if _client_creds not in _has_v3:
+        # call_stats() is STABLE, so HEAD works and returns no body.
+        resp = await client.head("/rpc/call_stats")
+        if resp.status_code == 404:
+            if not _logged_no_v3:
+                logger.warning("call_stats() missing (run supabase_migration_v3.sql). Matching 'Confirmed' in summary.")
+                _logged_no_v3 = True
+            return _BOOKED_BY_SUMMARY
+        _raise_for_status(resp)
+        _has_v3.add(_client_creds)
+    return {"was_booked": "is.true"}
+
+
+async def _count(client: httpx.AsyncClient, params: dict | None = None) -> int:
+    """Exact row count via HEAD — PostgREST returns it in Content-Range, no rows in the body."""
+    resp = await client.head("/call_logs", params=params, headers={"Prefer": "count=exact"})
+    _raise_for_status(resp)
+    return int(resp.headers["content-range"].split("/")[-1])
+
+
+# ─── Agent side tables ────────────────────────────────────────────────────────
+# Called from inside a live call, so these go through the async client too.
+# Errors propagate — the agent decides how loudly to log them.
+
+async def fetch_last_call(phone: str) -> dict | None:
+    """Most recent call_logs row (summary, created_at) for a phone number."""
+    client = _get_client()
+    if not client:
+        return None
+    rows = await _select(client, {
+        "select":       "summary, created_at",
+        "phone_number": f"eq.{phone}",
+        "order":        "created_at.desc",
+        "limit":        1,
+    })
+    return rows[0] if rows else None
+
+
+async def upsert_active_call(row: dict) -> None:
+    client = _get_client()
+    if not client:
+        return
+    resp = await client.post(
+        "/active_calls", json=row,
+        headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+    )
+    _raise_for_status(resp)
+
+
+async def log_transcript(row: dict) -> None:
+    client = _get_client()
+    if not client:
+        return
+    resp = await client.post("/call_transcripts", json=row, headers={"Prefer": "return=minimal"})
+    _raise_for_status(resp)
+
+
 # ─── save_call_log ────────────────────────────────────────────────────────────
+# Rows are queued and written by a background flusher in bulk inserts of up to
+# _BATCH_MAX rows, collected over at most _BATCH_WINDOW seconds.
+_BATCH_MAX = 50
+_BATCH_WINDOW = 0.5   # seconds
+
+_pending: asyncio.Queue | None = None
+_flusher_task: asyncio.Task | None = None
+_FLUSH = object()   # queued by flush_call_logs(): send the current batch now
 
-def save_call_log(
+
+async def save_call_log(
     phone: str,
     duration: int,
     transcript: str,
@@ -64,140 +385,258 @@ def save_call_log(
     interrupt_count: int = 0,
 ) -> dict:
     """
-    Insert a call log into Supabase.
+    Queue a call log for insertion into Supabase.
 
-    Strategy:
-    1. Try with all columns (including analytics columns from migration_v2).
-    2. If PGRST204 (column not in schema cache — migration not yet run),
-       retry with only the base columns so the call is never silently lost.
-    3. Retry up to 3× on transient SSL/network errors with exponential backoff.
+    The row is written by the background flusher (see _insert_batch); call
+    flush_call_logs() before the process exits so nothing is left queued.
     """
-    url = os.environ.get("SUPABASE_URL", "")
-    key = os.environ.get("SUPABASE_KEY", "")
-    if not url or not key:
-        logger.info(f"Supabase not configured. Local log → {phone} {duration}s")
+    if not _get_client():
         return {"success": False, "message": "Supabase not configured"}
+    if _circuit_open():
+        logger.warning(f"Supabase circuit open — dropping call log for {phone} {duration}s")
+        return {"success": False, "message": "circuit open"}
 
-    supabase = get_supabase()
-    if not supabase:
-        return {"success": False, "message": "Supabase client failed"}
-
-    # Build full payload
-    full_data: dict = {
-        "phone_number":    phone,
-        "duration_seconds": duration,
-        "transcript":      transcript,
-        "summary":         summary,
-        "sentiment":       sentiment,
-        "was_booked":      was_booked,
-        "interrupt_count": interrupt_count,
-    }
-    if recording_url:               full_data["recording_url"]      = recording_url
-    if caller_name:                 full_data["caller_name"]         = caller_name
-    if estimated_cost_usd is not None: full_data["estimated_cost_usd"] = estimated_cost_usd
-    if call_date:                   full_data["call_date"]           = call_date
-    if call_hour is not None:       full_data["call_hour"]           = call_hour
-    if call_day_of_week:            full_data["call_day_of_week"]    = call_day_of_week
-
-    # Base-only payload (fallback if migration not run)
-    base_data: dict = {k: v for k, v in full_data.items() if k not in _ANALYTICS_COLUMNS}
-
-    def _try_insert(data: dict, label: str) -> dict:
-        for attempt in range(_MAX_RETRIES):
+    row = CallLog(
+        phone_number=phone,
+        duration_seconds=duration,
+        transcript=transcript,
+        summary=summary,
+        sentiment=sentiment,
+        was_booked=was_booked,
+        interrupt_count=interrupt_count,
+        recording_url=recording_url or None,
+        caller_name=caller_name or None,
+        estimated_cost_usd=estimated_cost_usd,
+        call_date=call_date or None,
+        call_hour=call_hour,
+        call_day_of_week=call_day_of_week or None,
+    )
+
+    _ensure_flusher()
+    await _pending.put(row)
+    return {"success": True, "message": "queued"}
+
+
+async def flush_call_logs() -> None:
+    """Send whatever is queued right away and wait until it has been written (or given up on)."""
+    if _pending is not None:
+        _ensure_flusher()
+        await _pending.put(_FLUSH)
+        await _pending.join()
+
+
+def _ensure_flusher() -> None:
+    global _pending, _flusher_task
+    if _pending is None:
+        _pending = asyncio.Queue()
+    if _flusher_task is None or _flusher_task.done():
+        _flusher_task = asyncio.create_task(_flusher())
+
+
+async def _flusher() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await _pending.get()
+        if item is _FLUSH:
+            _pending.task_done()
+            continue
+        batch = [item]
+        flushed = False
+        deadline = loop.time() + _BATCH_WINDOW
+        while len(batch) < _BATCH_MAX:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
             try:
-                res = supabase.table("call_logs").insert(data).execute()
-                logger.info(f"Saved call log for {phone} ({label})")
-                return {"success": True, "data": res.data}
-            except Exception as e:
-                err = str(e)
-                if _is_schema_error(err):
-                    # Column missing — propagate so caller can retry with base
-                    raise RuntimeError("SCHEMA_ERROR:" + err)
-                if _is_retryable(err) and attempt < _MAX_RETRIES - 1:
-                    delay = _RETRY_DELAYS[attempt]
-                    logger.warning(f"Transient error (attempt {attempt+1}), retrying in {delay}s: {err[:80]}")
-                    time.sleep(delay)
-                    continue
-                logger.error(f"Failed to save call log ({label}): {e}")
-                return {"success": False, "message": err}
-        return {"success": False, "message": "Max retries exceeded"}
-
-    # Attempt 1: full payload
-    try:
-        return _try_insert(full_data, "full")
-    except RuntimeError as e:
-        err = str(e)
-        if "SCHEMA_ERROR" in err:
-            # Migration not run yet — fall back to base columns only
-            logger.warning(
-                "Analytics columns missing (run supabase_migration_v2.sql). "
-                "Falling back to base columns for this call log."
-            )
-            return _try_insert(base_data, "base-fallback")
-        raise
+                item = await asyncio.wait_for(_pending.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _FLUSH:
+                flushed = True   # don't wait out the window
+                break
+            batch.append(item)
+        try:
+            await _insert_batch(batch)
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} call log(s): {e}")
+        finally:
+            for _ in range(len(batch) + flushed):
+                _pending.task_done()
 
 
-# ─── fetch_call_logs ──────────────────────────────────────────────────────────
+async def _insert_batch(rows: list[CallLog]) -> dict:
+    """
+    Bulk-insert queued rows.
 
-def fetch_call_logs(limit: int = 50) -> list:
-    supabase = get_supabase()
-    if not supabase:
-        return []
-    for attempt in range(_MAX_RETRIES):
+    Strategy:
+    1. Call insert_call_logs() (supabase_migration_v3.sql, which requires v2)
+       — one round-trip for the whole batch.
+    2. If that function doesn't exist (PGRST202), use a plain bulk insert with
+       all columns — and skip step 1 host-wide for _RPC_MISSING_TTL seconds.
+    3. If PGRST204 (analytics columns not in schema cache — migration_v2 not
+       yet run), retry with only the base columns so the calls are never
+       silently lost.
+    4. Retry up to 3× on transient SSL/network errors with exponential backoff.
+    """
+    client = _get_client()
+    if not client:
+        return {"success": False, "message": "Supabase not configured"}
+
+    async def _try_insert(path: str, params: dict | None, body: bytes, label: str) -> dict:
         try:
-            res = (
-                supabase.table("call_logs")
-                .select("*")
-                .order("created_at", desc=True)
-                .limit(limit)
-                .execute()
-            )
-            return res.data
+            async for attempt in _retrying():
+                with attempt:
+                    if _circuit_open():
+                        return {"success": False, "message": "circuit open"}
+                    try:
+                        resp = await client.post(
+                            path,
+                            params=params,
+                            headers={
+                                "Content-Type": "application/json",
+                                "Prefer":       "return=minimal,missing=default",
+                            },
+                            content=body,
+                        )
+                        _raise_for_status(resp)
+                    except Exception as e:
+                        if _is_retryable(e):
+                            _record_failure()
+                        raise
         except Exception as e:
-            if _is_retryable(str(e)) and attempt < _MAX_RETRIES - 1:
-                time.sleep(_RETRY_DELAYS[attempt])
-                continue
-            logger.error(f"Failed to fetch call logs: {e}")
-            return []
-    return []
+            if isinstance(e, httpx.HTTPStatusError) and (
+                _is_missing_function(e.response) or _is_schema_error(e.response)
+            ):
+                raise
+            logger.error(f"Failed to save call logs ({label}): {e}")
+            return {"success": False, "message": str(e)}
+        _record_success()
+        _invalidate_cache()
+        logger.info(f"Saved {len(rows)} call log(s) ({label})")
+        return {"success": True}
 
+    url = _client_creds[0]
+    if not _insert_rpc_missing(url):
+        try:
+            return await _try_insert(
+                "/rpc/insert_call_logs", None, _json_encoder.encode({"p": rows}), "rpc"
+            )
+        except httpx.HTTPStatusError:
+            _mark_insert_rpc_missing(url)
+            logger.warning("insert_call_logs() missing (run supabase_migration_v3.sql). Using plain inserts.")
+
+    # Rows omit optional keys left at their default: name the column set
+    # explicitly and let absent keys take their column defaults. Keys outside
+    # ?columns= are ignored, so the base-column retry reuses the same body.
+    body = _json_encoder.encode(rows)
+    try:
+        return await _try_insert("/call_logs", {"columns": _CALL_LOG_COLUMNS}, body, "direct")
+    except httpx.HTTPStatusError as e:
+        if not _is_schema_error(e.response):
+            logger.error(f"Failed to save call logs (direct): {e}")
+            return {"success": False, "message": str(e)}
+        logger.warning("Analytics columns missing (run supabase_migration_v2.sql). Saving base columns only.")
+    try:
+        return await _try_insert("/call_logs", {"columns": _BASE_COLUMNS}, body, "base columns")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Failed to save call logs (base columns): {e}")
+        return {"success": False, "message": str(e)}
+
+
+# ─── fetch_call_logs ──────────────────────────────────────────────────────────
+
+def call_log_cursor(row: dict) -> str:
+    """Opaque, URL-safe keyset cursor for the page after `row` (a fetch_call_logs row)."""
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    """Inverse of call_log_cursor(); raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
 
-# ─── fetch_bookings ───────────────────────────────────────────────────────────
 
-def fetch_bookings() -> list:
-    supabase = get_supabase()
-    if not supabase:
+async def fetch_call_logs(limit: int = 50, before: str | None = None) -> list:
+    """
+    Newest-first page of call logs.
+
+    Keyset pagination on (created_at, id): pass call_log_cursor(last_row) as
+    `before` to get the next page — an index range scan, not an OFFSET sort.
+    Rows inserted in one batch share created_at, so id breaks the tie.
+    Raises ValueError for a malformed cursor.
+    """
+    client = _get_client()
+    if not client:
         return []
+    params = {
+        "select": "*",
+        "order":  "created_at.desc,id.desc",
+        "limit":  limit,
+    }
+    if before:
+        created_at, row_id = _decode_cursor(before)
+        params["or"] = f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id}))'
     try:
-        res = (
-            supabase.table("call_logs")
-            .select("id, phone_number, summary, created_at")
-            .ilike("summary", "%Confirmed%")
-            .order("created_at", desc=True)
-            .limit(200)
-            .execute()
-        )
-        return res.data
+        async for attempt in _retrying():
+            with attempt:
+                return await _select(client, params)
     except Exception as e:
-        logger.error(f"Failed to fetch bookings: {e}")
+        logger.error(f"Failed to fetch call logs: {e}")
+    return []
+
+
+# ─── fetch_bookings ───────────────────────────────────────────────────────────
+
+@_cached(_CACHE_TTL, fallback=list)
+async def fetch_bookings() -> list:
+    client = _get_client()
+    if not client:
         return []
+    return await _select(client, {
+        "select": "id, phone_number, summary, created_at",
+        "order":  "created_at.desc",
+        "limit":  200,
+        **await _booked_filter(client),
+    })
 
 
 # ─── fetch_stats ──────────────────────────────────────────────────────────────
 
-def fetch_stats() -> dict:
-    _empty = {"total_calls": 0, "total_bookings": 0, "avg_duration": 0, "booking_rate": 0}
-    supabase = get_supabase()
-    if not supabase:
-        return _empty
-    try:
-        rows = (supabase.table("call_logs").select("duration_seconds, summary").execute()).data or []
-        total = len(rows)
-        bookings = sum(1 for r in rows if "Confirmed" in r.get("summary", ""))
-        durations = [r["duration_seconds"] for r in rows if r.get("duration_seconds")]
-        avg_dur = round(sum(durations) / len(durations)) if durations else 0
-        rate = round((bookings / total) * 100) if total else 0
-        return {"total_calls": total, "total_bookings": bookings, "avg_duration": avg_dur, "booking_rate": rate}
-    except Exception as e:
-        logger.error(f"Failed to fetch stats: {e}")
-        return _empty
+def _empty_stats() -> dict:
+    return {"total_calls": 0, "total_bookings": 0, "avg_duration": 0, "booking_rate": 0}
+
+
+@_cached(_CACHE_TTL, fallback=_empty_stats)
+async def fetch_stats() -> dict:
+    client = _get_client()
+    if not client:
+        return _empty_stats()
+    # Aggregated in Postgres by call_stats() (supabase_migration_v3.sql)
+    resp = await client.post("/rpc/call_stats", json={})
+    if not _is_missing_function(resp):
+        _raise_for_status(resp)
+        _has_v3.add(_client_creds)
+        rows = orjson.loads(resp.content)
+        return rows[0] if rows else _empty_stats()
+    logger.warning("call_stats() missing (run supabase_migration_v3.sql). Aggregating in Python.")
+    return await _fetch_stats_fallback(client)
+
+
+async def _fetch_stats_fallback(client: httpx.AsyncClient) -> dict:
+    # Only reached without call_stats(), i.e. before v3 has realigned was_booked.
+    # Issued concurrently: both counts via HEAD, durations for the mean
+    total, bookings, duration_rows = await asyncio.gather(
+        _count(client),
+        _count(client, _BOOKED_BY_SUMMARY),
+        _select(client, {"select": "duration_seconds", "duration_seconds": "gt.0"}),
+    )
+    durations = np.fromiter((r["duration_seconds"] for r in duration_rows),
+                            dtype=np.int32, count=len(duration_rows))
+    avg_dur = int(durations.mean().round()) if durations.size else 0
+    rate = round((bookings / total) * 100) if total else 0
+    return {"total_calls": total, "total_bookings": bookings, "avg_duration": avg_dur, "booking_rate": rate}
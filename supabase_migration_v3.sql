@@ -0,0 +1,62 @@
+-- ══════════════════════════════════════════════════════════════════════════════
+-- SUPABASE MIGRATION v3 — Run once in Supabase SQL Editor (after v2)
+-- Server-side aggregates, read-path indexes and a schema-tolerant insert.
+-- Safe to re-run: CREATE OR REPLACE / IF NOT EXISTS throughout.
+-- ══════════════════════════════════════════════════════════════════════════════
+
+-- 1. Bookings are flagged by was_booked (migration v2), not by summary text.
+--    Older rows set it from the booking *intent* (TRUE even for "Booking Failed"),
+--    so realign every row with its summary, then index the true rows. db.py only
+--    reads was_booked once call_stats() (section 3) exists, i.e. after this ran.
+UPDATE call_logs SET was_booked = (coalesce(summary, '') ILIKE '%Confirmed%')
+    WHERE was_booked IS DISTINCT FROM (coalesce(summary, '') ILIKE '%Confirmed%');
+CREATE INDEX IF NOT EXISTS idx_call_logs_was_booked
+    ON call_logs (was_booked) WHERE was_booked;
+
+-- 2. Keyset pagination for db.fetch_call_logs (ORDER BY created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_call_logs_created_at_id
+    ON call_logs (created_at DESC, id DESC);
+
+-- 3. Dashboard stats in one round-trip (called by db.fetch_stats via /rpc/call_stats)
+CREATE OR REPLACE FUNCTION call_stats()
+RETURNS TABLE (
+    total_calls    BIGINT,
+    total_bookings BIGINT,
+    avg_duration   INTEGER,
+    booking_rate   INTEGER
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        count(*),
+        count(*) FILTER (WHERE was_booked),
+        coalesce(round(avg(duration_seconds) FILTER (WHERE duration_seconds > 0)), 0)::int,
+        coalesce(round(100.0 * count(*) FILTER (WHERE was_booked)
+                       / nullif(count(*), 0)), 0)::int
+    FROM call_logs
+$$;
+
+-- 4. Schema-tolerant bulk insert (called by db._insert_batch via /rpc/insert_call_logs)
+--    jsonb_populate_recordset ignores keys with no matching column, so a stale
+--    schema cache or a missing analytics column never costs a second insert.
+--    Absent keys become NULL (not the column default), so created_at is filled
+--    in here and OVERRIDING USER VALUE lets the identity column generate id.
+CREATE OR REPLACE FUNCTION insert_call_logs(p JSONB)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    WITH ins AS (
+        INSERT INTO call_logs OVERRIDING USER VALUE
+        SELECT * FROM jsonb_populate_recordset(
+            NULL::call_logs,
+            (SELECT jsonb_agg(jsonb_build_object('created_at', now()) || r)
+               FROM jsonb_array_elements(p) AS r)
+        )
+        RETURNING 1
+    )
+    SELECT count(*) FROM ins
+$$;
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- DONE. You can re-run this script safely at any time.
+-- ══════════════════════════════════════════════════════════════════════════════
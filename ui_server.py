@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.responses import HTMLResponse, PlainTextResponse
 from dotenv import load_dotenv
 
@@ -65,17 +65,22 @@ async def api_post_config(request: Request):
     return {"status": "success"}
 
 @app.get("/api/logs")
-async def api_get_logs():
+async def api_get_logs(response: Response, before: str | None = None, limit: int = Query(50, ge=1, le=500)):
     config = read_config()
     os.environ["SUPABASE_URL"] = config.get("supabase_url", "")
     os.environ["SUPABASE_KEY"] = config.get("supabase_key", "")
     import db
     try:
-        logs = db.fetch_call_logs(limit=50)
-        return logs
+        logs = await db.fetch_call_logs(limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching logs: {e}")
         return []
+    if len(logs) == limit:
+        # Opaque, URL-safe cursor: GET /api/logs?before=<X-Next-Cursor>
+        response.headers["X-Next-Cursor"] = db.call_log_cursor(logs[-1])
+    return logs
 
 @app.get("/api/logs/{log_id}/transcript")
 async def api_get_transcript(log_id: str):
@@ -84,8 +89,7 @@ async def api_get_transcript(log_id: str):
     os.environ["SUPABASE_KEY"] = config.get("supabase_key", "")
     import db
     try:
-        from supabase import create_client
-        supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        supabase = db.get_supabase()
         res = supabase.table("call_logs").select("*").eq("id", log_id).single().execute()
         data = res.data
         text = f"Call Log — {data.get('created_at', '')}\n"
@@ -106,7 +110,7 @@ async def api_get_bookings():
     os.environ["SUPABASE_KEY"] = config.get("supabase_key", "")
     import db
     try:
-        return db.fetch_bookings()
+        return await db.fetch_bookings()
     except Exception as e:
         logger.error(f"Error fetching bookings: {e}")
         return []
@@ -118,7 +122,7 @@ async def api_get_stats():
     os.environ["SUPABASE_KEY"] = config.get("supabase_key", "")
     import db
     try:
-        return db.fetch_stats()
+        return await db.fetch_stats()
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
         return {"total_calls": 0, "total_bookings": 0, "avg_duration": 0, "booking_rate": 0}
@@ -129,9 +133,9 @@ async def api_get_contacts():
     config = read_config()
     os.environ["SUPABASE_URL"] = config.get("supabase_url", "")
     os.environ["SUPABASE_KEY"] = config.get("supabase_key", "")
+    import db
     try:
-        from supabase import create_client
-        supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        supabase = db.get_supabase()
         res = supabase.table("call_logs") \
             .select("phone_number, caller_name, summary, created_at") \
             .order("created_at", desc=True) \